@@ -32,6 +32,14 @@ def main():
         '--max-lines', default=1000, type=int,
         help="Don't start suricata analysis over this file size"
     )
+    parser.add_argument(
+        '--debounce-ms', default=100, type=int,
+        help="Delay in milliseconds without change before parsing an edited file"
+    )
+    parser.add_argument(
+        '--no-lint-on-save', action="store_true",
+        help="Don't run suricata analysis when a file is saved"
+    )
     args = parser.parse_args()
     if args.version:
         print("{0}".format(__version__))
@@ -40,6 +48,8 @@ def main():
     settings = {
         "suricata_binary": args.suricata_binary,
         "max_lines": args.max_lines,
+        "debounce_ms": args.debounce_ms,
+        "lint_on_save": not args.no_lint_on_save,
     }
     #
     stdin, stdout = _binary_stdio()
@@ -1,11 +1,21 @@
 import json
 import logging
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
 try:
     import Queue
 except ImportError:
     import queue as Queue
 import threading
 from collections import deque
+from functools import lru_cache
 import os
 try:
     from urllib.parse import unquote, quote
@@ -16,6 +26,7 @@ except ImportError:
 log = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4096)
 def path_from_uri(uri):
     # Convert file uri to path (strip html like head part)
     if not uri.startswith("file://"):
@@ -27,6 +38,7 @@ def path_from_uri(uri):
     return os.path.normpath(unquote(path))
 
 
+@lru_cache(maxsize=4096)
 def path_to_uri(path):
     # Convert path to file uri (add html like head part)
     if os.name == "nt":
@@ -53,7 +65,9 @@ class ReadWriter:
         return data.decode("utf-8")
 
     def write(self, out):
-        self.writer.write(out.encode())
+        if isinstance(out, str):
+            out = out.encode()
+        self.writer.write(out)
         self.writer.flush()
 
 
@@ -66,7 +80,9 @@ class TCPReadWriter(ReadWriter):
         return self.reader.read(*args).decode("utf-8")
 
     def write(self, out):
-        self.writer.write(out.encode())
+        if isinstance(out, str):
+            out = out.encode()
+        self.writer.write(out)
         self.writer.flush()
 
 
@@ -75,6 +91,8 @@ class JSONRPC2Connection:
         self.conn = conn
         self._msg_buffer = deque()
         self._next_id = 1
+        # Messages can be sent from server helper threads
+        self._write_lock = threading.Lock()
 
     def _read_header_content_length(self, line):
         if len(line) < 2 or line[-2:] != "\r\n":
@@ -99,7 +117,7 @@ class JSONRPC2Connection:
             line = self.conn.readline()
         body = self.conn.read(length)
         log.debug("RECV %s", body)
-        return json.loads(body)
+        return json_loads(body)
 
     def read_message(self, want=None):
         """Read a JSON RPC message sent over the current connection. If
@@ -123,14 +141,16 @@ class JSONRPC2Connection:
             self._msg_buffer.append(msg)
 
     def _send(self, body):
-        body = json.dumps(body, separators=(",", ":"))
-        content_length = len(body)
+        # Body is encoded to bytes, Content-Length counts bytes
+        body = json_dumps(body)
         response = (
             "Content-Length: {0}\r\n"
             "Content-Type: application/vscode-jsonrpc; charset=utf8\r\n\r\n"
-            "{1}".format(content_length, body))
-        self.conn.write(response)
-        log.debug("SEND %s", body)
+            .format(len(body)).encode() + body)
+        with self._write_lock:
+            self.conn.write(response)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("SEND %s", body.decode('utf-8'))
 
     def write_response(self, rid, result):
         body = {
@@ -277,7 +297,7 @@ def read_rpc_messages(content):
             line = content.readline()
         body = content.read(length)
         # log.debug("RECV %s", body)
-        return json.loads(body)
+        return json_loads(body)
     #
     result_list = []
     while(True):
@@ -1,21 +1,61 @@
+import bisect
+import hashlib
+import json
 import logging
 import os
+import shutil
+import tempfile
 import traceback
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from suricatals.jsonrpc import path_from_uri
-from suricatals.parse_signatures import SuricataFile
+from suricatals.jsonrpc import path_from_uri, json_loads
+from suricatals.parse_signatures import SuricataFile, MULTILINES_REGEX
 from suricatals.tests_rules import TestRules
 
 log = logging.getLogger(__name__)
 
-SURICATA_RULES_EXT_REGEX = re.compile(r'^\.rules?$', re.I)
+SURICATA_RULES_EXT = ('.rules', '.rule')
+# Delay in seconds to gather watched files changes before updating workspace
+WATCHED_FILES_DELAY = 0.05
+# Delay in seconds to gather diagnostics before publishing them
+DIAGNOSTICS_DELAY = 0.03
 
 def init_file(filepath, suricata_binary):
     file_obj = SuricataFile(filepath, suricata_binary=suricata_binary)
     return file_obj, None
 
 
+def merge_line_ranges(range_a, range_b):
+    # None stands for the whole file
+    if range_a is None or range_b is None:
+        return None
+    return min(range_a[0], range_b[0]), max(range_a[1], range_b[1])
+
+
+def walk_source_dirs(root_path, excl_set):
+    """Yield directories below root_path containing rules files"""
+    dir_stack = [root_path]
+    while dir_stack:
+        dir_path = dir_stack.pop()
+        if dir_path in excl_set:
+            continue
+        contains_source = False
+        try:
+            with os.scandir(dir_path) as dir_it:
+                for entry in dir_it:
+                    if entry.is_dir():
+                        # Same as os.walk, don't follow symlinks
+                        if not entry.is_symlink():
+                            dir_stack.append(entry.path)
+                    elif not contains_source and entry.name.lower().endswith(SURICATA_RULES_EXT):
+                        contains_source = True
+        except OSError:
+            continue
+        if contains_source:
+            yield dir_path
+
+
 class LangServer:
     def __init__(self, conn, debug_log=False, settings=None):
         self.conn = conn
@@ -23,10 +63,29 @@ class LangServer:
         self.root_path = None
         self.fs = None
         self.workspace = {}
+        self.parse_lock = threading.Lock()
+        self.pending_reparse = {}
+        self.pending_reparse_lock = threading.Lock()
+        self.dirty_paths = set()
+        self.dirty_paths_timer = None
+        self.dirty_paths_lock = threading.Lock()
+        # Documents opened in editor, their contents is owned by the editor
+        self.open_paths = set()
+        self.pending_diags = {}
+        self.pending_diags_timer = None
+        self.pending_diags_lock = threading.Lock()
+        # Suricata checks are run by background threads
+        self.diag_executor = ThreadPoolExecutor(max_workers=2)
+        self.diag_jobs = {}
+        # Increased for each job, so that entries can be removed once done
+        self.diag_generation = 0
+        self.diag_jobs_lock = threading.Lock()
         self.source_dirs = []
         self.excl_paths = []
-        self.excl_suffixes = []
+        self.excl_set = frozenset()
+        self.excl_suffixes = ()
         self.post_messages = []
+        self.post_messages_lock = threading.Lock()
         self.streaming = True
         self.debug_log = debug_log
         # Get launch settings
@@ -37,7 +96,14 @@ class LangServer:
         self.sync_type = settings.get("sync_type", 1)
         self.suricata_binary = settings.get("suricata_binary", 'suricata')
         self.max_lines = settings.get("max_lines", 1000)
-        self.keywords_list = TestRules(suricata_binary=self.suricata_binary).build_keywords_list()
+        # Delay without change before parsing an edited file
+        self.debounce_ms = settings.get("debounce_ms", 100)
+        self.lint_on_save = settings.get("lint_on_save", True)
+        self.keywords_list = []
+        self.keywords_labels = []
+        self.keywords_ready = threading.Event()
+        self.init_thread = None
+        self.handlers = self.build_handlers()
 
     def post_message(self, message, msg_type=1):
         self.conn.send_notification("window/showMessage", {
@@ -45,6 +111,11 @@ class LangServer:
             "message": message
         })
 
+    def queue_message(self, message, msg_type=1):
+        # Message will be sent by the main loop after current request
+        with self.post_messages_lock:
+            self.post_messages.append([msg_type, message])
+
     def run(self):
         # Run server
         while self.running:
@@ -58,17 +129,21 @@ class LangServer:
                 log.error("Unexpected error: %s", e, exc_info=True)
                 break
             else:
-                for message in self.post_messages:
-                    self.post_message(message[1], message[0])
-                self.post_messages = []
+                with self.post_messages_lock:
+                    post_messages = self.post_messages
+                    self.post_messages = []
+                # Send one notification per message type
+                messages_by_type = {}
+                for message in post_messages:
+                    messages_by_type.setdefault(message[0], []).append(message[1])
+                for msg_type, messages in messages_by_type.items():
+                    self.post_message("\n".join(messages), msg_type)
 
-    def handle(self, request):
+    def build_handlers(self):
         # pylint: disable=unused-argument
         def noop(request):
             return None
-        # Request handler
-        log.debug("REQUEST %s %s", request.get("id"), request.get("method"))
-        handler = {
+        return {
             "initialize": self.serve_initialize,
             "textDocument/documentSymbol": noop,
             "textDocument/completion": self.serve_autocomplete,
@@ -84,15 +159,17 @@ class LangServer:
             "textDocument/didChange": self.serve_onChange,
             "textDocument/codeAction": noop,
             "initialized": noop,
-            "workspace/didChangeWatchedFiles": noop,
+            "workspace/didChangeWatchedFiles": self.serve_watched_files,
             "workspace/symbol": noop,
             "$/cancelRequest": noop,
             "shutdown": noop,
             "exit": self.serve_exit,
-        }.get(request["method"], self.serve_default)
-        # handler = {
-        #     "workspace/symbol": self.serve_symbols,
-        # }.get(request["method"], self.serve_default)
+        }
+
+    def handle(self, request):
+        # Request handler
+        log.debug("REQUEST %s %s", request.get("id"), request.get("method"))
+        handler = self.handlers.get(request["method"], self.serve_default)
         # We handle notifications differently since we can't respond
         if "id" not in request:
             try:
@@ -128,14 +205,17 @@ class LangServer:
         self.root_path = path_from_uri(
             params.get("rootUri") or params.get("rootPath") or "")
         self.source_dirs.append(self.root_path)
+        init_options = params.get("initializationOptions") or {}
+        self.debounce_ms = init_options.get("debounce_ms", self.debounce_ms)
+        self.lint_on_save = init_options.get("lint_on_save", self.lint_on_save)
         # Check for config file
         config_path = os.path.join(self.root_path, ".suricatals")
         config_exists = os.path.isfile(config_path)
         if config_exists:
             try:
-                import json
                 with open(config_path, 'r', encoding='utf-8') as fhandle:
-                    config_dict = json.load(fhandle)
+                    config_dict = json_loads(fhandle.read())
+                    self.lint_on_save = config_dict.get("lint_on_save", self.lint_on_save)
                     for excl_path in config_dict.get("excl_paths", []):
                         self.excl_paths.append(os.path.join(self.root_path, excl_path))
                     source_dirs = config_dict.get("source_dirs", [])
@@ -148,39 +228,22 @@ class LangServer:
                         if os.path.isdir(dir_path):
                             self.source_dirs.append(dir_path)
                         else:
-                            self.post_messages.append(
-                                [2, r'Source directory "{0}" specified in '
-                                 r'".suricatals" settings file does not exist'.format(dir_path)]
+                            self.queue_message(
+                                r'Source directory "{0}" specified in '
+                                r'".suricatals" settings file does not exist'.format(dir_path), 2
                             )
                     for ext_source_dir in ext_source_dirs:
                         if os.path.isdir(ext_source_dir):
                             self.source_dirs.append(ext_source_dir)
                         else:
-                            self.post_messages.append(
-                                [2, r'External source directory "{0}" specified in '
-                                 r'".suricatals" settings file does not exist'.format(ext_source_dir)]
+                            self.queue_message(
+                                r'External source directory "{0}" specified in '
+                                r'".suricatals" settings file does not exist'.format(ext_source_dir), 2
                             )
             # pylint: disable=W0703
             except Exception:
-                self.post_messages.append([1, 'Error while parsing ".suricatals" settings file'])
-        # Recursively add sub-directories
-        if len(self.source_dirs) == 1:
-            self.source_dirs = []
-            for dirName, subdirList, fileList in os.walk(self.root_path):
-                if self.excl_paths.count(dirName) > 0:
-                    while(len(subdirList) > 0):
-                        del subdirList[0]
-                    continue
-                contains_source = False
-                for filename in fileList:
-                    _, ext = os.path.splitext(os.path.basename(filename))
-                    if SURICATA_RULES_EXT_REGEX.match(ext):
-                        contains_source = True
-                        break
-                if contains_source:
-                    self.source_dirs.append(dirName)
-        # Initialize workspace
-        self.workspace_init()
+                self.queue_message('Error while parsing ".suricatals" settings file')
+        self.excl_set = frozenset(os.path.normpath(excl_path) for excl_path in self.excl_paths)
         #
         server_capabilities = {
             "completionProvider": {
@@ -196,13 +259,75 @@ class LangServer:
             #"workspaceSymbolProvider": True,
             "textDocumentSync": self.sync_type
         }
-        if self.notify_init:
-            self.post_messages.append([3, "suricatals initialization complete"])
+        # Keywords list and workspace are built in background to answer quickly
+        self.init_thread = threading.Thread(target=self.background_init, daemon=True)
+        self.init_thread.start()
         return {"capabilities": server_capabilities}
         #     "workspaceSymbolProvider": True,
         #     "streaming": False,
         # }
 
+    def background_init(self):
+        try:
+            self.set_keywords_list(self.get_keywords_list())
+        # pylint: disable=W0703
+        except Exception:
+            log.error("Unable to build keywords list", exc_info=True)
+            self.queue_message('Unable to get keywords list from "{0}"'.format(self.suricata_binary))
+        finally:
+            self.keywords_ready.set()
+        try:
+            # Recursively add sub-directories
+            if len(self.source_dirs) == 1:
+                self.source_dirs = self.find_source_dirs()
+            # Initialize workspace
+            self.workspace_init()
+        # pylint: disable=W0703
+        except Exception:
+            log.error("Error during workspace initialization", exc_info=True)
+            self.queue_message('Error during workspace initialization')
+            return
+        if self.notify_init:
+            self.queue_message("suricatals initialization complete", 3)
+
+    def keywords_cache_path(self):
+        # Keywords list depends only on the Suricata binary
+        binary_path = shutil.which(self.suricata_binary)
+        if binary_path is None:
+            return None
+        binary_path = os.path.realpath(binary_path)
+        binary_stat = os.stat(binary_path)
+        binary_key = "{0}:{1}:{2}".format(binary_path, binary_stat.st_mtime_ns, binary_stat.st_size)
+        cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(cache_dir, "suricatals",
+                            "keywords-{0}.json".format(hashlib.sha1(binary_key.encode('utf-8')).hexdigest()))
+
+    def get_keywords_list(self):
+        cache_path = self.keywords_cache_path()
+        if cache_path is not None and os.path.isfile(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as fhandle:
+                    return json_loads(fhandle.read())
+            except (OSError, ValueError):
+                log.warning("Invalid keywords cache file %s", cache_path, exc_info=True)
+        keywords_list = TestRules(suricata_binary=self.suricata_binary).build_keywords_list()
+        if cache_path is not None and len(keywords_list):
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as fhandle:
+                    json.dump(keywords_list, fhandle)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                log.warning("Unable to write keywords cache file %s", cache_path, exc_info=True)
+        return keywords_list
+
+    def set_keywords_list(self, keywords_list):
+        # Sorted labels allow prefix search with bisect
+        keywords_list = sorted(keywords_list, key=lambda item: item['label'])
+        self.keywords_labels = [item['label'] for item in keywords_list]
+        self.keywords_list = keywords_list
+
     def serve_autocomplete(self, request):
         params = request["params"]
         uri = params["textDocument"]["uri"]
@@ -215,10 +340,10 @@ class LangServer:
         sig_index = params['position']['character'] 
         log.debug(sig_content)
         # not yet in content matching so just return nothing
-        if not '(' in sig_content[0:sig_index]:
+        if sig_content.find('(', 0, sig_index) == -1:
             if edit_index == 0:
                 return None
-            elif not re.search(r'\\ *$', file_obj.contents_split[edit_index - 1]):
+            elif not MULTILINES_REGEX.search(file_obj.contents_split[edit_index - 1]):
                 return None
                 
         cursor = sig_index - 1
@@ -236,21 +361,38 @@ class LangServer:
         cursor += 1
         partial_keyword = sig_content[cursor:sig_index]
         log.debug("Got keyword start: '%s'", partial_keyword)
-        items_list = []
-        for item in self.keywords_list:
-            if item['label'].startswith(partial_keyword):
-                items_list.append(item)
+        # keywords list may still be under construction
+        if not self.keywords_ready.wait(timeout=0.1):
+            return None
+        start = bisect.bisect_left(self.keywords_labels, partial_keyword)
+        end = bisect.bisect_left(self.keywords_labels, partial_keyword + '\uffff', start)
+        items_list = self.keywords_list[start:end]
         if len(items_list):
             return items_list
         return None
 
     def send_diagnostics(self, uri):
+        # Replace any diagnostics job not yet started for this file
+        with self.diag_jobs_lock:
+            job = self.diag_jobs.get(uri)
+            if job is not None:
+                job[0].cancel()
+            self.diag_generation += 1
+            generation = self.diag_generation
+            future = self.diag_executor.submit(self.run_diagnostics, uri, generation)
+            self.diag_jobs[uri] = (future, generation)
+
+    def run_diagnostics(self, uri, generation):
+        # Run from a diagnostics executor thread
         diag_results, diag_exp = self.get_diagnostics(uri)
+        with self.diag_jobs_lock:
+            # Drop results if a newer job was requested meanwhile
+            job = self.diag_jobs.get(uri)
+            if job is None or job[1] != generation:
+                return
+            del self.diag_jobs[uri]
         if diag_results is not None:
-            self.conn.send_notification("textDocument/publishDiagnostics", {
-                "uri": uri,
-                "diagnostics": diag_results
-            })
+            self.queue_diagnostics(uri, diag_results)
         elif diag_exp is not None:
             self.conn.write_error(
                 -1,
@@ -260,12 +402,37 @@ class LangServer:
                     "traceback": traceback.format_exc(),
                 })
 
+    def queue_diagnostics(self, uri, diagnostics):
+        # Diagnostics received in a short time are published together
+        with self.pending_diags_lock:
+            self.pending_diags[uri] = diagnostics
+            if self.pending_diags_timer is not None:
+                self.pending_diags_timer.cancel()
+            self.pending_diags_timer = threading.Timer(DIAGNOSTICS_DELAY, self.flush_diagnostics)
+            self.pending_diags_timer.daemon = True
+            self.pending_diags_timer.start()
+
+    def flush_diagnostics(self):
+        # Run from the diagnostics timer thread
+        with self.pending_diags_lock:
+            pending_diags = self.pending_diags
+            self.pending_diags = {}
+            self.pending_diags_timer = None
+        for uri, diagnostics in pending_diags.items():
+            self.conn.send_notification("textDocument/publishDiagnostics", {
+                "uri": uri,
+                "diagnostics": diagnostics
+            })
+
     def get_diagnostics(self, uri):
         filepath = path_from_uri(uri)
         file_obj = self.workspace.get(filepath)
         if file_obj is not None and file_obj.nLines < self.max_lines:
+            # Maps are changed in place by reparses from other threads
+            with self.parse_lock:
+                line_maps = file_obj.line_maps()
             try:
-                diags = file_obj.check_file()
+                diags = file_obj.check_file(line_maps)
             # pylint: disable=W0703
             except Exception as e:
                 if os.path.isfile(file_obj.path):
@@ -288,26 +455,106 @@ class LangServer:
             return
         else:
             # Update file contents with changes
-            reparse_req = True
-            if self.sync_type == 1:
-                file_obj.apply_change(params["contentChanges"][0])
-            else:
-                try:
-                    reparse_req = False
-                    for change in params["contentChanges"]:
-                        reparse_flag = file_obj.apply_change(change)
-                        reparse_req = (reparse_req or reparse_flag)
-                # pylint: disable=W0703
-                except Exception:
-                    self.post_message('Change request failed for file "{0}": Could not apply change'.format(path))
-                    log.error('Change request failed for file "%s": Could not apply change', path, exc_info=True)
-                    return
-        # Parse newly updated file
+            content_changes = params["contentChanges"]
+            with self.parse_lock:
+                if self.sync_type == 1:
+                    reparse_req, line_range = file_obj.apply_change(content_changes[0])
+                else:
+                    try:
+                        if len(content_changes) == 1:
+                            # Most editors send a single change per request
+                            reparse_req, line_range = file_obj.apply_change(content_changes[0])
+                        else:
+                            reparse_req = False
+                            line_range = None
+                            for change in content_changes:
+                                reparse_flag, change_range = file_obj.apply_change(change)
+                                if reparse_flag:
+                                    if reparse_req:
+                                        line_range = merge_line_ranges(line_range, change_range)
+                                    else:
+                                        line_range = change_range
+                                reparse_req = (reparse_req or reparse_flag)
+                    # pylint: disable=W0703
+                    except Exception:
+                        self.post_message('Change request failed for file "{0}": Could not apply change'.format(path))
+                        log.error('Change request failed for file "%s": Could not apply change', path, exc_info=True)
+                        return
+        # Parse newly updated file once editing pauses
         if reparse_req:
-            _, err_str = self.update_workspace_file(path)
-            if err_str is not None:
-                self.post_message('Change request failed for file "{0}": {1}'.format(path, err_str))
-                return
+            self.schedule_reparse(path, line_range)
+
+    def schedule_reparse(self, path, line_range=None):
+        with self.pending_reparse_lock:
+            pending = self.pending_reparse.get(path)
+            if pending is not None:
+                pending[0].cancel()
+                line_range = merge_line_ranges(pending[1], line_range)
+            timer = threading.Timer(self.debounce_ms / 1000, self.reparse_file, args=(path, line_range))
+            timer.daemon = True
+            self.pending_reparse[path] = (timer, line_range)
+            timer.start()
+
+    def cancel_reparse(self, path):
+        with self.pending_reparse_lock:
+            pending = self.pending_reparse.pop(path, None)
+            if pending is not None:
+                pending[0].cancel()
+
+    def reparse_file(self, path, line_range=None):
+        # Run from the reparse timer thread
+        with self.pending_reparse_lock:
+            pending = self.pending_reparse.get(path)
+            if pending is not None and pending[0] is threading.current_thread():
+                del self.pending_reparse[path]
+        file_obj = self.workspace.get(path)
+        if file_obj is None:
+            return
+        with self.parse_lock:
+            try:
+                # Changes may have reverted contents to the parsed state,
+                # only checked before full parses as hashing reads all lines
+                if line_range is None and file_obj.parsed_hash is not None \
+                        and file_obj.contents_hash() == file_obj.parsed_hash:
+                    return
+                file_obj.parse_file(line_range)
+            # pylint: disable=W0703
+            except Exception:
+                log.error("Error while parsing file %s", path, exc_info=True)
+
+    def serve_watched_files(self, request):
+        # Changes are gathered and applied in one pass after a short delay
+        params = request["params"]
+        with self.dirty_paths_lock:
+            for change in params.get("changes", []):
+                self.dirty_paths.add(path_from_uri(change["uri"]))
+            if self.dirty_paths_timer is None:
+                self.dirty_paths_timer = threading.Timer(WATCHED_FILES_DELAY, self.update_dirty_paths)
+                self.dirty_paths_timer.daemon = True
+                self.dirty_paths_timer.start()
+
+    def update_dirty_paths(self):
+        # Run from the watched files timer thread
+        with self.dirty_paths_lock:
+            dirty_paths = self.dirty_paths
+            self.dirty_paths = set()
+            self.dirty_paths_timer = None
+        source_dirs = set(os.path.normpath(os.path.abspath(source_dir)) for source_dir in self.source_dirs)
+        file_list = []
+        for path in dirty_paths:
+            # Editor sends changes for opened documents
+            if path in self.open_paths:
+                continue
+            file_obj = self.workspace.get(path)
+            if not os.path.isfile(path):
+                self.workspace.pop(path, None)
+            elif file_obj is None:
+                if os.path.dirname(os.path.normpath(path)) in source_dirs and self.is_source_file(path):
+                    file_list.append(path)
+            elif file_obj.hash is not None:
+                # Refresh closed file loaded when it was opened
+                self.update_workspace_file(path, read_file=True)
+        self.init_files(file_list)
 
     def serve_onOpen(self, request):
         self.serve_onSave(request, did_open=True)
@@ -320,6 +567,10 @@ class LangServer:
         params = request["params"]
         uri = params["textDocument"]["uri"]
         filepath = path_from_uri(uri)
+        if did_open:
+            self.open_paths.add(filepath)
+        elif did_close:
+            self.open_paths.discard(filepath)
         # Skip update and remove objects if file is deleted
         if did_close and (not os.path.isfile(filepath)):
             return
@@ -327,7 +578,7 @@ class LangServer:
         if err_str is not None:
             self.post_message('Save request failed for file "{0}": {1}'.format(filepath, err_str))
             return
-        if did_change:
+        if did_change and (did_open or self.lint_on_save):
             self.send_diagnostics(uri)
 
     def update_workspace_file(self, filepath, read_file=False, allow_empty=False):
@@ -347,8 +598,10 @@ class LangServer:
                 hash_old = file_obj.hash
                 err_string = None
                 if os.path.isfile(filepath):
-                    err_string = file_obj.load_from_disk()
-                    file_obj.parse_file()
+                    # File on disk supersedes any pending change
+                    self.cancel_reparse(filepath)
+                    with self.parse_lock:
+                        err_string = file_obj.load_from_disk()
                 if err_string is not None:
                     log.error("%s: %s", err_string, filepath)
                     return False, err_string  # Error during file read
@@ -358,45 +611,50 @@ class LangServer:
         except Exception:
             log.error("Error while parsing file %s", filepath, exc_info=True)
             return False, 'Error during parsing'  # Error during parsing
-        if filepath not in self.workspace:
-            self.workspace[filepath] = file_obj
+        # Workspace init may have added an empty object for this file meanwhile
+        self.workspace[filepath] = file_obj
         return True, None
 
-    def workspace_init(self):
+    def find_source_dirs(self):
+        # Get directories containing rules files below root path
+        return list(walk_source_dirs(self.root_path, self.excl_set))
+
+    def is_excluded(self, filepath):
+        return filepath in self.excl_set or filepath.endswith(self.excl_suffixes)
+
+    def is_source_file(self, filepath):
+        return filepath.lower().endswith(SURICATA_RULES_EXT) and not self.is_excluded(filepath)
+
+    def get_source_files(self):
         # Get filenames
         file_list = []
         for source_dir in self.source_dirs:
-            for filename in os.listdir(source_dir):
-                _, ext = os.path.splitext(os.path.basename(filename))
-                if SURICATA_RULES_EXT_REGEX.match(ext):
-                    filepath = os.path.normpath(os.path.join(source_dir, filename))
-                    if self.excl_paths.count(filepath) > 0:
+            with os.scandir(source_dir) as dir_it:
+                for entry in dir_it:
+                    if not entry.name.lower().endswith(SURICATA_RULES_EXT) or not entry.is_file():
                         continue
-                    inc_file = True
-                    for excl_suffix in self.excl_suffixes:
-                        if filepath.endswith(excl_suffix):
-                            inc_file = False
-                            break
-                    if inc_file:
+                    filepath = os.path.normpath(entry.path)
+                    if not self.is_excluded(filepath):
                         file_list.append(filepath)
-        # Process files
-        from multiprocessing import Pool
-        pool = Pool(processes=self.nthreads)
-        results = {}
-        for filepath in file_list:
-            results[filepath] = pool.apply_async(init_file, args=(filepath, self.suricata_binary))
-        pool.close()
-        pool.join()
-        for path, result in results.items():
-            result_obj = result.get()
+        return file_list
+
+    def workspace_init(self):
+        self.init_files(self.get_source_files())
+
+    def init_files(self, file_list):
+        # Process files, objects are only created here so no worker is needed
+        for path in file_list:
+            result_obj = init_file(path, self.suricata_binary)
             if result_obj[0] is None:
-                self.post_messages.append([1, 'Initialization failed for file "{0}": {1}'.format(path, result_obj[1])])
+                self.queue_message('Initialization failed for file "{0}": {1}'.format(path, result_obj[1]))
                 continue
-            self.workspace[path] = result_obj[0]
+            # File may have been opened by editor during initialization
+            self.workspace.setdefault(path, result_obj[0])
 
     # pylint: disable=unused-argument
     def serve_exit(self, request):
         # Exit server
+        self.diag_executor.shutdown(wait=False)
         self.workspace = {}
         self.running = False
 
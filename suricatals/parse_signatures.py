@@ -4,6 +4,11 @@ import re
 
 from suricatals.tests_rules import TestRules
 
+COMMENT_REGEX = re.compile(r"[ \t]*#")
+SID_REGEX = re.compile(r"sid *:(\d+)")
+MULTILINES_REGEX = re.compile(r"\\ *$")
+
+
 class SuricataFile:
     def __init__(self, path=None, suricata_binary='suricata'):
         self.path = path
@@ -12,8 +17,12 @@ class SuricataFile:
         self.content_line_map= {}
         self.line_content_map= {}
         self.sid_line_map= {}
+        # All lines holding a content or sid, to find next owner on clear
+        self.content_lines = {}
+        self.sid_lines = {}
         self.nLines = 0
         self.hash = None
+        self.parsed_hash = None
 
     def copy(self):
         """Copy content to new file object (does not copy objects)"""
@@ -36,8 +45,15 @@ class SuricataFile:
         else:
             return None
 
-    def check_file(self):
+    def line_maps(self):
+        """Copy of line maps, taken under parse lock for checks in threads"""
+        return dict(self.line_content_map), dict(self.content_line_map), dict(self.sid_line_map)
+
+    def check_file(self, line_maps=None):
         diagnostics = []
+        if line_maps is None:
+            line_maps = self.line_maps()
+        line_content_map, content_line_map, sid_line_map = line_maps
         result = {}
         with open(self.path, 'r', encoding='utf-8', errors='replace') as fhandle:
             test_rules = TestRules(suricata_binary=self.suricata_binary)
@@ -45,7 +61,7 @@ class SuricataFile:
         for error in result.get('errors', []):
             if 'line' in error:
                 range_end = 1000
-                line_content = self.line_content_map.get(error['line'])
+                line_content = line_content_map.get(error['line'])
                 if line_content:
                     range_end = len(line_content.rstrip())
                 diagnostics.append({ "range": { "start": {"line": error['line'], "character": 0}, "end": {"line": error['line'], "character": range_end} }, "message": error['message'], "source": error['source'], "severity": 1 })
@@ -56,11 +72,11 @@ class SuricataFile:
             if 'line' in warning:
                 line = warning['line']
             elif 'content' in warning:
-                line = self.content_line_map.get(warning['content'])
+                line = content_line_map.get(warning['content'])
                 range_start = warning['content'].index('sid:')
                 range_end = range_start + len('sid:')
             elif 'sid' in warning:
-                line = self.sid_line_map.get(warning['sid'])
+                line = sid_line_map.get(warning['sid'])
             if line is None:
                 continue
             diagnostics.append({ "range": { "start": {"line": line, "character": range_start}, "end": {"line": line, "character": range_end} }, "message": warning['message'], "source": warning['source'], "severity": 2 })
@@ -69,7 +85,7 @@ class SuricataFile:
             if 'line' in info:
                 line = info['line']
             elif 'content' in info:
-                line = self.content_line_map.get(info['content'])
+                line = content_line_map.get(info['content'])
             if line is None:
                 continue
             start_char = info.get('start_char', 0)
@@ -77,49 +93,148 @@ class SuricataFile:
             diagnostics.append({ "range": { "start": {"line": line, "character": start_char}, "end": {"line": line, "character": end_char} }, "message": info['message'], "source": info['source'], "severity": 4 })
         return diagnostics
 
-    def parse_file(self):
-        """Build file Info by parsing file"""
-        i = 0
-        self.content_line_map = {}
-        self.line_content_map = {}
-        self.sid_line_map = {}
-        is_comment = re.compile(r"[ \t]*#")
-        getsid = re.compile(r"sid *:(\d+)")
-        get_multilines = re.compile(r"\\ *$" )
+    def parse_file(self, line_range=None):
+        """Build file Info by parsing file
+
+        If line_range is set, only the lines in this (start, end) range
+        are parsed again when they contain complete single line rules.
+        """
+        if line_range is not None and self.is_single_lines_range(*line_range):
+            self.clear_lines(*line_range)
+            self.parse_lines(*line_range)
+            # Hashing whole contents would cost more than the partial parse
+            self.parsed_hash = None
+        else:
+            self.content_line_map = {}
+            self.line_content_map = {}
+            self.sid_line_map = {}
+            self.content_lines = {}
+            self.sid_lines = {}
+            self.parse_lines(0, self.nLines)
+            self.parsed_hash = self.contents_hash()
+
+    def contents_hash(self):
+        """Cheap digest of current contents"""
+        return hashlib.blake2b("\n".join(self.contents_split).encode('utf-8'), digest_size=8).digest()
+
+    def is_single_lines_range(self, start, end):
+        """Check that lines in range are not part of a multi lines rule"""
+        if start < 0 or end > self.nLines:
+            return False
+        for line in self.contents_split[start:end]:
+            if MULTILINES_REGEX.search(line):
+                return False
+        # Previous rule line must not continue on first line of range
+        i = start - 1
+        while i >= 0 and COMMENT_REGEX.match(self.contents_split[i]):
+            i -= 1
+        return i < 0 or not MULTILINES_REGEX.search(self.contents_split[i])
+
+    def clear_lines(self, start, end):
+        """Remove info about rules starting in range of lines"""
+        for i in range(start, end):
+            content = self.line_content_map.pop(i, None)
+            if content is None:
+                continue
+            self.unregister_line(self.content_line_map, self.content_lines, content, i)
+            match = SID_REGEX.search(content)
+            if match:
+                sid = int(match.groups()[0])
+                self.unregister_line(self.sid_line_map, self.sid_lines, sid, i)
+
+    @staticmethod
+    def unregister_line(line_map, lines_map, key, index):
+        """Remove line from key holders, last remaining line becomes owner"""
+        lines = lines_map.get(key)
+        if lines is None:
+            return
+        lines.discard(index)
+        if not lines:
+            del lines_map[key]
+            line_map.pop(key, None)
+        elif line_map.get(key) == index:
+            line_map[key] = max(lines)
+
+    def parse_lines(self, start, end):
+        """Parse range of lines, on duplicates the last line is kept"""
         multi_lines_index = -1
-        for line in self.contents_split:
-            if is_comment.match(line):
-                i += 1
+        for i in range(start, end):
+            line = self.contents_split[i]
+            if COMMENT_REGEX.match(line):
                 continue
             if multi_lines_index >= 0:
                 self.line_content_map[multi_lines_index] += line.rstrip('\\')
-                if get_multilines.search(line):
-                    i += 1
+                if MULTILINES_REGEX.search(line):
                     continue
-                else:
-                    self.content_line_map[self.line_content_map[multi_lines_index]] = multi_lines_index
-                    match = getsid.search(self.line_content_map[multi_lines_index])
-                    if match:
-                        sid = int(match.groups()[0])
+                content = self.line_content_map[multi_lines_index]
+                if self.content_line_map.get(content, -1) < multi_lines_index:
+                    self.content_line_map[content] = multi_lines_index
+                self.content_lines.setdefault(content, set()).add(multi_lines_index)
+                match = SID_REGEX.search(content)
+                if match:
+                    sid = int(match.groups()[0])
+                    if self.sid_line_map.get(sid, -1) < multi_lines_index:
                         self.sid_line_map[sid] = multi_lines_index
-                    multi_lines_index = -1
-                    i += 1
-                    continue
-            elif get_multilines.search(line):
+                    self.sid_lines.setdefault(sid, set()).add(multi_lines_index)
+                multi_lines_index = -1
+                continue
+            if MULTILINES_REGEX.search(line):
                 multi_lines_index = i
                 self.line_content_map[multi_lines_index] = line.rstrip('\\')
-                i += 1
                 continue
-            else:
+            if self.content_line_map.get(line, -1) < i:
                 self.content_line_map[line] = i
-                self.line_content_map[i] = line
-            match = getsid.search(line)
+            self.content_lines.setdefault(line, set()).add(i)
+            self.line_content_map[i] = line
+            match = SID_REGEX.search(line)
             if match:
                 sid = int(match.groups()[0])
-                self.sid_line_map[sid] = i
-            i += 1
+                if self.sid_line_map.get(sid, -1) < i:
+                    self.sid_line_map[sid] = i
+                self.sid_lines.setdefault(sid, set()).add(i)
 
     def apply_change(self, content_update):
-        self.contents_split = content_update['text'].splitlines()
-        self.nLines = len(self.contents_split)
-        self.parse_file()
+        """Update file contents with a full or ranged change
+
+        Return a (reparse, line_range) tuple telling if file needs to be
+        parsed again and the range of changed lines, None if the number
+        of lines has changed or if a multi lines rule was edited.
+        """
+        old_lines = self.contents_split
+        if 'range' not in content_update:
+            new_lines = content_update['text'].splitlines()
+            self.contents_split = new_lines
+            self.nLines = len(new_lines)
+            if len(new_lines) != len(old_lines):
+                return True, None
+            start = 0
+            while start < len(new_lines) and new_lines[start] == old_lines[start]:
+                start += 1
+            if start == len(new_lines):
+                return False, None
+            end = len(new_lines)
+            while new_lines[end - 1] == old_lines[end - 1]:
+                end -= 1
+            old_changed = old_lines[start:end]
+        else:
+            change_start = content_update['range']['start']
+            change_end = content_update['range']['end']
+            start = change_start['line']
+            old_changed = old_lines[start:change_end['line'] + 1]
+            # Range can end after the final newline, past the last line
+            at_eof = change_end['line'] >= len(old_lines)
+            prefix = old_lines[start][:change_start['character']] if start < len(old_lines) else ''
+            suffix = '' if at_eof else old_lines[change_end['line']][change_end['character']:]
+            new_text = prefix + content_update['text'] + suffix
+            new_lines = new_text.splitlines()
+            if not at_eof and (not new_text or new_text.endswith(('\n', '\r'))):
+                new_lines.append('')
+            self.contents_split[start:start + len(old_changed)] = new_lines
+            self.nLines = len(self.contents_split)
+            if len(new_lines) != len(old_changed):
+                return True, None
+            end = start + len(new_lines)
+        for line in old_changed:
+            if MULTILINES_REGEX.search(line):
+                return True, None
+        return True, (start, end)
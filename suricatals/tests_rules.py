@@ -19,24 +19,117 @@ along with Scirius.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from json.decoder import JSONDecodeError
+from functools import lru_cache
+import atexit
 import subprocess
 import tempfile
 import shutil
 import os
-import json
 import io
 import re
 import logging
 
+from suricatals.jsonrpc import json_loads
+
 log = logging.getLogger(__name__)
 
+# Run suricata on a memory backed directory if possible
+TMPFS_DIR = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+
+
+@lru_cache(maxsize=8)
+def shared_config_dir(reference_config, classification_config):
+    """Write reference and classification files once for all checks"""
+    config_dir = tempfile.mkdtemp(prefix='suricatals-config-', dir=TMPFS_DIR)
+    atexit.register(shutil.rmtree, config_dir, ignore_errors=True)
+    with open(os.path.join(config_dir, "reference.config"), 'wb') as rf:
+        rf.write(reference_config)
+    with open(os.path.join(config_dir, "classification.config"), 'wb') as cf:
+        cf.write(classification_config)
+    return config_dir
+
+
+def parse_engine_analysis_line(line):
+    """Build signature message from a line of engine analysis rules.json"""
+    try:
+        signature_info = json_loads(line)
+    except (JSONDecodeError, UnicodeDecodeError):
+        return None
+    signature_msg = {'content': signature_info['raw'], 'warnings': [], 'info': []}
+    if 'id' in signature_info:
+        signature_msg['sid'] = signature_info['id']
+    if 'flags' in signature_info:
+        if 'toserver' in signature_info['flags'] and 'toclient' in signature_info['flags']:
+            signature_msg['warnings'].append('Rule inspect server and client side, consider adding a flow keyword')
+    if 'mpm' in signature_info:
+        signature_msg['info'].append('Fast Pattern "%s" on %s' % (signature_info['mpm']['pattern'], signature_info['mpm']['buffer']))
+    elif 'engines' in signature_info:
+        # Suricata 6.0.x don't have the mpm sub object
+        fp_buffer = None
+        fp_pattern = None
+        for engine in signature_info['engines']:
+            if engine['is_mpm']:
+                fp_buffer = engine['name']
+                for match in engine.get('matches', []):
+                    if match.get('content', {}).get('is_mpm', False):
+                        fp_pattern = match['content']['pattern']
+        if fp_buffer and fp_pattern:
+            signature_msg['info'].append('Fast Pattern "%s" on %s' % (fp_pattern, fp_buffer))
+    if 'warnings' in signature_info:
+        signature_msg['warnings'].extend(signature_info.get('warnings', []))
+    if 'notes' in signature_info:
+        signature_msg['info'].extend(signature_info.get('notes', []))
+    if 'engines' in signature_info:
+        app_proto = None
+        multiple_app_proto = False
+        got_raw_match = False
+        got_content = False
+        got_pcre = False
+        for engine in signature_info['engines']:
+            if 'app_proto' in engine:
+                if app_proto is None:
+                    app_proto = engine.get('app_proto')
+                else:
+                    if app_proto != engine.get('app_proto'):
+                        if not app_proto in ['http', 'http2'] or not engine.get('app_proto') in ['http', 'http2']:
+                            multiple_app_proto = True
+            else:
+                got_raw_match = True
+            for match in engine.get('matches', []):
+                if match['name'] == 'content':
+                    got_content = True
+                elif match['name'] == 'pcre':
+                    got_pcre = True
+        if got_pcre and not got_content:
+            signature_msg['warnings'].append('Rule with pcre without content match (possible perfomance issue)')
+        if app_proto is not None and got_raw_match:
+            signature_msg['warnings'].append('Application layer "%s" combined with raw match, consider using a match on application buffer' %  (app_proto))
+        if multiple_app_proto:
+            signature_msg['warnings'].append('Multiple application layers in same signature')
+    # suricata can report the same message for several engines
+    signature_msg['warnings'] = list(dict.fromkeys(signature_msg['warnings']))
+    signature_msg['info'] = list(dict.fromkeys(signature_msg['info']))
+    return signature_msg
+
+
 class TestRules():
     VARIABLE_ERROR = 101
     OPENING_RULE_FILE = 41  # Error when opening a file referenced in the source
     OPENING_DATASET_FILE = 322  # Error when opening a dataset referenced in the source
     RULEFILE_ERRNO = [39, 42]
     USELESS_ERRNO = [40, 43, 44]
-    CONFIG_FILE = """
+    MAX_LINE_LENGTH = 65536  # Longer output lines are not decoded
+    FOPEN_REGEX = re.compile(r"fopen '([^:]*)' failed: No such file or directory")
+    HASH_FILE_REGEX = re.compile(r"opening hash file ([^:]*): No such file or directory")
+    SID_REGEX = re.compile(r"sid *:(\d+)")
+    AT_LINE_REGEX = re.compile(r"at line (\d+)$")
+    # Test run messages with error codes handled as warnings
+    WARNING_CODES_REGEX = re.compile(rb'"error_code": *(?:176|276)\b')
+    # Signature block of rules_analysis.txt: header, rule, details and an empty line
+    ANALYSIS_BLOCK_REGEX = re.compile(
+        r"^(?P<header>==[^\n]*)\n(?:(?P<content>(?!==)[^\n]+)\n(?P<body>(?:(?!==)[^\n]+\n)*))?\n",
+        re.MULTILINE)
+    CONFIG_FILE = b"""
 %YAML 1.1
 ---
 logging:
@@ -78,7 +171,7 @@ vars:
     TEREDO_PORTS: 3544
 """
 
-    REFERENCE_CONFIG = """
+    REFERENCE_CONFIG = b"""
 # config reference: system URL
 
 config reference: bugtraq   http://www.securityfocus.com/bid/
@@ -107,7 +200,7 @@ config reference: xforce    http://xforce.iss.net/xforce/xfdb/
 config reference: msft      http://technet.microsoft.com/security/bulletin/
 """
 
-    CLASSIFICATION_CONFIG = """
+    CLASSIFICATION_CONFIG = b"""
 config classification: not-suspicious,Not Suspicious Traffic,3
 config classification: unknown,Unknown Traffic,3
 config classification: bad-unknown,Potentially Bad Traffic, 2
@@ -167,28 +260,37 @@ config classification: command-and-control,Malware Command and Control Activity
             'errors': [],
             'warnings': [],
         }
-        variable_list = []
+        variable_set = set()
+        variables_regex = None
         files_list = []
+        files_regex = None
         ignore_next = False
+        raw_lines = []
         error_stream = io.StringIO(error)
         for line in error_stream:
+            if not line.strip():
+                continue
+            if len(line) > self.MAX_LINE_LENGTH:
+                raw_lines.append(line[:self.MAX_LINE_LENGTH] + "...\n")
+                continue
             try:
-                s_err = json.loads(line)
+                s_err = json_loads(line)
             except JSONDecodeError:
-                ret['errors'].append({'message': error, 'format': 'raw', 'source': self.SURICATA_SYNTAX_CHECK})
-                return ret
+                raw_lines.append(line)
+                continue
             s_err['engine']['source'] = self.SURICATA_SYNTAX_CHECK
             errno = s_err['engine']['error_code']
             if not single or errno not in self.RULEFILE_ERRNO:
                 if errno == self.VARIABLE_ERROR:
-                    variable = s_err['engine']['message'].split("\"")[1]
-                    if not "$" + variable in variable_list:
-                        variable_list.append("$" + variable)
+                    variable = s_err['engine']['message'].split("\"", 2)[1]
+                    if not "$" + variable in variable_set:
+                        variable_set.add("$" + variable)
+                        variables_regex = re.compile('|'.join(re.escape(var) for var in variable_set))
                         s_err['engine']['message'] = "Custom address variable \"$%s\" is used and need to be defined in probes configuration" % (variable)
                         ret['warnings'].append(s_err['engine'])
                     continue
                 if errno == self.OPENING_DATASET_FILE:
-                    m = re.match('fopen \'([^:]*)\' failed: No such file or directory', s_err['engine']['message'])
+                    m = self.FOPEN_REGEX.match(s_err['engine']['message'])
                     if m is not None:
                         datasource = m.group(1)
                         s_err['engine']['message'] = 'Dataset source "%s" is a dependancy and needs to be added to rulesets' % datasource
@@ -196,11 +298,12 @@ config classification: command-and-control,Malware Command and Control Activity
                         ignore_next = True
                         continue
                 if errno == self.OPENING_RULE_FILE:
-                    m = re.match('opening hash file ([^:]*): No such file or directory', s_err['engine']['message'])
+                    m = self.HASH_FILE_REGEX.match(s_err['engine']['message'])
                     if m is not None:
                         filename = m.group(1)
                         filename = filename.rsplit('/', 1)[1]
                         files_list.append(filename)
+                        files_regex = re.compile('|'.join(': *%s *;' % re.escape(fname) for fname in files_list))
                         s_err['engine']['message'] = 'External file "%s" is a dependancy and needs to be added to rulesets' % filename
                         ret['warnings'].append(s_err['engine'])
                         continue
@@ -214,67 +317,64 @@ config classification: command-and-control,Malware Command and Control Activity
                             ignore_next = False
                             continue
                         # exclude error on variable
-                        found = False
-                        for variable in variable_list:
-                            if variable in s_err['engine']['message']:
-                                found = True
-                                break
-                        else:
-                            # exclude error on external file
-                            for filename in files_list:
-                                if re.search(': *%s *;' % filename, s_err['engine']['message']):
-                                    found = True
-                                    break
-                        if found:
+                        if variables_regex is not None and variables_regex.search(s_err['engine']['message']):
+                            continue
+                        # exclude error on external file
+                        if files_regex is not None and files_regex.search(s_err['engine']['message']):
                             continue
                         if 'error parsing signature' in s_err['engine']['message']:
                             message = s_err['engine']['message']
-                            s_err['engine']['message'] = s_err['engine']['message'].split(' from file')[0]
-                            getsid = re.compile(r"sid *:(\d+)")
-                            match = getsid.search(line)
+                            s_err['engine']['message'] = s_err['engine']['message'].partition(' from file')[0]
+                            match = self.SID_REGEX.search(line)
                             if match:
                                 s_err['engine']['sid'] = int(match.groups()[0])
-                            getline = re.compile(r"at line (\d+)$")
-                            match = getline.search(message)
+                            match = self.AT_LINE_REGEX.search(message)
                             if match:
                                 line_nb = int(match.groups()[0])
                                 if len(ret['errors']):
                                     ret['errors'][-1]['line'] = line_nb - 1
                                 continue
                     if errno == 42:
-                        s_err['engine']['message'] = s_err['engine']['message'].split(' from')[0]
+                        s_err['engine']['message'] = s_err['engine']['message'].partition(' from')[0]
                     ret['errors'].append(s_err['engine'])
+        # report output that could not be decoded as a single error
+        if raw_lines:
+            log.warning("%d lines of suricata output could not be decoded", len(raw_lines))
+            ret['errors'].append({'message': ''.join(raw_lines), 'format': 'raw', 'source': self.SURICATA_SYNTAX_CHECK})
         return ret
 
     def generate_config(self, tmpdir, config_buffer=None, related_files=None, reference_config=None, classification_config=None):
+        # configuration buffers are written as bytes
         if not reference_config:
             reference_config = self.REFERENCE_CONFIG
-        reference_file = os.path.join(tmpdir, "reference.config")
-        rf = open(reference_file, 'w', encoding='utf-8')
-        rf.write(reference_config)
-        rf.close()
-
+        elif isinstance(reference_config, str):
+            reference_config = reference_config.encode('utf-8')
         if not classification_config:
             classification_config = self.CLASSIFICATION_CONFIG
-        classification_file = os.path.join(tmpdir, "classification.config")
-        cf = open(classification_file, 'w', encoding='utf-8')
-        cf.write(classification_config)
-        cf.close()
+        elif isinstance(classification_config, str):
+            classification_config = classification_config.encode('utf-8')
+        config_dir = shared_config_dir(reference_config, classification_config)
+        if not os.path.isdir(config_dir):
+            # removed by a temporary files cleaner
+            shared_config_dir.cache_clear()
+            config_dir = shared_config_dir(reference_config, classification_config)
 
         if not config_buffer:
             config_buffer = self.CONFIG_FILE
+        elif isinstance(config_buffer, str):
+            config_buffer = config_buffer.encode('utf-8')
         config_file = os.path.join(tmpdir, "suricata.yaml")
-        cf = open(config_file, 'w', encoding='utf-8')
+        cf = open(config_file, 'wb')
         # write the config file in temp dir
         cf.write(config_buffer)
-        cf.write("mpm-algo: ac-bs\n")
-        cf.write("default-rule-path: " + tmpdir + "\n")
-        cf.write("reference-config-file: " + tmpdir + "/reference.config\n")
-        cf.write("classification-file: " + tmpdir + "/classification.config\n")
-        cf.write("""
+        cf.write(("mpm-algo: ac-bs\n"
+                  "default-rule-path: " + tmpdir + "\n"
+                  "reference-config-file: " + os.path.join(config_dir, "reference.config") + "\n"
+                  "classification-file: " + os.path.join(config_dir, "classification.config") + "\n"
+                  """
 engine-analysis:
   rules-fast-pattern: yes
-  rules: yes""")
+  rules: yes""").encode('utf-8'))
 
         cf.close()
         related_files = related_files or {}
@@ -287,71 +387,73 @@ engine-analysis:
         return config_file
 
     def rule_buffer(self, rule_buffer, config_buffer=None, related_files=None, reference_config=None, classification_config=None):
-        # create temp directory
-        tmpdir = tempfile.mkdtemp()
-        # write the rule file in temp dir
-        rule_file = os.path.join(tmpdir, "file.rules")
-        rf = open(rule_file, 'w', encoding='utf-8')
-        rf.write(rule_buffer)
-        rf.close()
-
-        config_file = self.generate_config(tmpdir, config_buffer=config_buffer, related_files=related_files, reference_config=reference_config, classification_config=classification_config)
-
-        suri_cmd = [self.suricata_binary, '-T', '-l', tmpdir, '-S', rule_file, '-c', config_file]
-        # start suricata in test mode
-        suriprocess = subprocess.Popen(suri_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        (outdata, errdata) = suriprocess.communicate()
-        result = {'status': True, 'errors': "", 'warnings': [], 'info': [] }
-        # if not a success
-        if suriprocess.returncode != 0:
-            result['status'] = False
-            result['errors'] = errdata.decode('utf-8')
-        # analyse potential warnings
-        message_stream = io.StringIO(outdata.decode('utf-8'))
-        for message in message_stream:
-            try:
-                struct_msg = json.loads(message)
-            except JSONDecodeError:
-                continue
-            if not 'engine' in struct_msg:
-                continue
-            # Check for duplicate signatures
-            error_code = struct_msg['engine'].get('error_code', 0) 
-            if error_code == 176:
-                warning, sig_content = struct_msg['engine']['message'].split('"', 1)
-                result['warnings'].append({'message': warning.rstrip(), 'source': self.SURICATA_SYNTAX_CHECK, 'content': sig_content.rstrip('"')})
-            # Message for invalid signature
-            elif error_code == 276:
-                rule, warning = struct_msg['engine']['message'].split(': ', 1)
-                rule = int(rule.split(' ')[1])
-                result['warnings'].append({'message': warning.rstrip(), 'source': self.SURICATA_SYNTAX_CHECK, 'sid': rule})
-
-        # runs rules analysis to have warnings
-        suri_cmd = [self.suricata_binary, '--engine-analysis', '-l', tmpdir, '-S', rule_file, '-c', config_file]
-        # start suricata in test mode
-        suriprocess = subprocess.Popen(suri_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        (outdata, errdata) = suriprocess.communicate()
-        engine_analysis = self.parse_engine_analysis(tmpdir)
-        for signature in engine_analysis:
-            for warning in signature.get('warnings', []):
-                result['warnings'].append({'message': warning, 'source': self.SURICATA_ENGINE_ANALYSIS, 'content': signature['content']})
-            for info in signature.get('info', []):
-                msg = {'message': info, 'source': self.SURICATA_ENGINE_ANALYSIS, 'content': signature['content'], 'start_char': 0, 'end_char': 1}
-                if "Fast Pattern \"" in info:
-                    if 'fast_pattern' in signature['content']:
-                        continue
-                    if signature['content'].count('content:') <= 1:
-                        continue
-                    pattern = info.split('"')[1]
-                    try:
-                        msg['start_char'] = signature['content'].index(pattern)
-                        msg['end_char'] = signature['content'].index(pattern) + len(pattern)
-                    except ValueError:
-                        msg['start_char'] = 0
-                        msg['end_char'] = 1
-                result['info'].append(msg)
-        shutil.rmtree(tmpdir)
-        return result
+        # create temp directory, on tmpfs when available
+        with tempfile.TemporaryDirectory(dir=TMPFS_DIR) as tmpdir:
+            # write the rule file in temp dir
+            rule_file = os.path.join(tmpdir, "file.rules")
+            rf = open(rule_file, 'w', encoding='utf-8')
+            rf.write(rule_buffer)
+            rf.close()
+
+            config_file = self.generate_config(tmpdir, config_buffer=config_buffer, related_files=related_files, reference_config=reference_config, classification_config=classification_config)
+
+            suri_cmd = [self.suricata_binary, '-T', '-l', tmpdir, '-S', rule_file, '-c', config_file]
+            result = {'status': True, 'errors': "", 'warnings': [], 'info': [] }
+            # start suricata in test mode, errors go to a file to avoid blocking on a full pipe
+            with tempfile.TemporaryFile() as errors_file:
+                with subprocess.Popen(suri_cmd, stdout=subprocess.PIPE, stderr=errors_file) as suriprocess:
+                    # analyse potential warnings as they are output, JSON decoders take bytes
+                    for message in suriprocess.stdout:
+                        # only decode messages that can be used
+                        if not self.WARNING_CODES_REGEX.search(message):
+                            continue
+                        try:
+                            struct_msg = json_loads(message)
+                        except (JSONDecodeError, UnicodeDecodeError):
+                            continue
+                        if not 'engine' in struct_msg:
+                            continue
+                        # Check for duplicate signatures
+                        error_code = struct_msg['engine'].get('error_code', 0)
+                        if error_code == 176:
+                            warning, sig_content = struct_msg['engine']['message'].split('"', 1)
+                            result['warnings'].append({'message': warning.rstrip(), 'source': self.SURICATA_SYNTAX_CHECK, 'content': sig_content.rstrip('"')})
+                        # Message for invalid signature
+                        elif error_code == 276:
+                            rule, warning = struct_msg['engine']['message'].split(': ', 1)
+                            rule = int(rule.split(' ', 2)[1])
+                            result['warnings'].append({'message': warning.rstrip(), 'source': self.SURICATA_SYNTAX_CHECK, 'sid': rule})
+                # if not a success
+                if suriprocess.returncode != 0:
+                    result['status'] = False
+                    errors_file.seek(0)
+                    result['errors'] = errors_file.read().decode('utf-8')
+
+            # runs rules analysis to have warnings if test run did not output it
+            if not self.has_engine_analysis(tmpdir):
+                suri_cmd = [self.suricata_binary, '--engine-analysis', '-l', tmpdir, '-S', rule_file, '-c', config_file]
+                # start suricata in engine analysis mode, only output files are used
+                subprocess.run(suri_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+            engine_analysis = self.parse_engine_analysis(tmpdir)
+            for signature in engine_analysis:
+                for warning in signature.get('warnings', []):
+                    result['warnings'].append({'message': warning, 'source': self.SURICATA_ENGINE_ANALYSIS, 'content': signature['content']})
+                for info in signature.get('info', []):
+                    msg = {'message': info, 'source': self.SURICATA_ENGINE_ANALYSIS, 'content': signature['content'], 'start_char': 0, 'end_char': 1}
+                    if "Fast Pattern \"" in info:
+                        if 'fast_pattern' in signature['content']:
+                            continue
+                        # nothing to tell if there is a single content match
+                        first_content = signature['content'].find('content:')
+                        if signature['content'].find('content:', first_content + 1) == -1:
+                            continue
+                        pattern = info.split('"', 2)[1]
+                        pattern_index = signature['content'].find(pattern)
+                        if pattern_index != -1:
+                            msg['start_char'] = pattern_index
+                            msg['end_char'] = pattern_index + len(pattern)
+                    result['info'].append(msg)
+            return result
 
     def check_rule_buffer(self, rule_buffer, config_buffer=None, related_files=None, single=False):
         related_files = related_files or {}
@@ -361,6 +463,12 @@ engine-analysis:
             prov_result['errors'] = res['errors']
         return prov_result
 
+    def has_engine_analysis(self, log_dir):
+        for analysis_file in ('rules.json', 'rules_analysis.txt'):
+            if os.path.isfile(os.path.join(log_dir, analysis_file)):
+                return True
+        return False
+
     def parse_engine_analysis(self, log_dir):
         json_path = os.path.join(log_dir, 'rules.json')
         if os.path.isfile(json_path):
@@ -370,118 +478,38 @@ engine-analysis:
     def parse_engine_analysis_v1(self, log_dir):
         analysis = []
         with open(os.path.join(log_dir, 'rules_analysis.txt'), 'r', encoding='utf-8') as analysis_file:
-            in_sid_data = False
-            signature = {}
-            for line in analysis_file:
-                if line.startswith("=="):
-                    in_sid_data = True
-                    signature = {'sid': line.split(' ')[2]}
-                    continue
-                elif in_sid_data and len(line) == 1:
-                    in_sid_data = False
-                    analysis.append(signature)
-                    signature = {}
-                elif in_sid_data and not 'content' in signature:
-                    signature['content'] = line.strip()
-                    continue
-                elif in_sid_data and 'Warning: ' in line:
-                    warning = line.split('arning: ')[1]
-                    if not 'warnings' in signature:
-                        signature['warnings'] = []
-                    signature['warnings'].append(warning.strip())
-                elif in_sid_data and 'Fast Pattern' in line:
-                    if not 'info' in signature:
-                        signature['info'] = []
-                    signature['info'].append(line.strip())
+            analysis_data = analysis_file.read()
+        for block in self.ANALYSIS_BLOCK_REGEX.finditer(analysis_data):
+            signature = {'sid': block.group('header').split(' ', 3)[2]}
+            if block.group('content') is not None:
+                signature['content'] = block.group('content').strip()
+                for line in block.group('body').splitlines():
+                    if 'Warning: ' in line:
+                        warning = line.split('arning: ', 2)[1]
+                        if not 'warnings' in signature:
+                            signature['warnings'] = []
+                        signature['warnings'].append(warning.strip())
+                    elif 'Fast Pattern' in line:
+                        if not 'info' in signature:
+                            signature['info'] = []
+                        signature['info'].append(line.strip())
+            analysis.append(signature)
         return analysis
 
     def parse_engine_analysis_v2(self, json_path):
-        analysis = []
-        with open(json_path, 'r', encoding='utf-8') as analysis_file:
-            for line in analysis_file:
-                signature_info = {}
-                try:
-                    signature_info = json.loads(line)
-                except JSONDecodeError:
-                    pass
-                signature_msg = {'content': signature_info['raw']}
-                if 'id' in signature_info:
-                    signature_msg['sid'] = signature_info['id']
-                if 'flags' in signature_info:
-                    if 'toserver' in signature_info['flags'] and 'toclient' in signature_info['flags']:
-                        if not 'warnings' in signature_msg:
-                            signature_msg['warnings'] = []
-                        signature_msg['warnings'].append('Rule inspect server and client side, consider adding a flow keyword')
-                if 'mpm' in signature_info:
-                    if not 'info' in signature_msg:
-                        signature_msg['info'] = []
-                    signature_msg['info'].append('Fast Pattern "%s" on %s' % (signature_info['mpm']['pattern'], signature_info['mpm']['buffer']))
-                elif 'engines' in signature_info:
-                    # Suricata 6.0.x don't have the mpm sub object
-                    fp_buffer = None
-                    fp_pattern = None
-                    for engine in signature_info['engines']:
-                        if engine['is_mpm']:
-                            fp_buffer = engine['name']
-                            for match in engine.get('matches', []):
-                                if match.get('content', {}).get('is_mpm', False):
-                                    fp_pattern = match['content']['pattern']
-                    if fp_buffer and fp_pattern:
-                        if not 'info' in signature_msg:
-                            signature_msg['info'] = []
-                        signature_msg['info'].append('Fast Pattern "%s" on %s' % (fp_pattern, fp_buffer))
-                if 'warnings' in signature_info:
-                    if not 'warnings' in signature_msg:
-                        signature_msg['warnings'] = []
-                    signature_msg['warnings'].extend(signature_info.get('warnings', []))
-                if 'notes' in signature_info:
-                    if not 'info' in signature_msg:
-                        signature_msg['info'] = []
-                    signature_msg['info'].extend(signature_info.get('notes', []))
-                if 'engines' in signature_info:
-                    app_proto = None
-                    multiple_app_proto = False
-                    got_raw_match = False
-                    got_content = False
-                    got_pcre = False
-                    for engine in signature_info['engines']:
-                        if 'app_proto' in engine:
-                            if app_proto is None:
-                                app_proto = engine.get('app_proto')
-                            else:
-                                if app_proto != engine.get('app_proto'):
-                                    if not app_proto in ['http', 'http2'] or not engine.get('app_proto') in ['http', 'http2']:
-                                        multiple_app_proto = True
-                        else:
-                            got_raw_match = True
-                        for match in engine.get('matches', []):
-                            if match['name'] == 'content':
-                                got_content = True
-                            elif match['name'] == 'pcre':
-                                got_pcre = True
-                    if got_pcre and not got_content:
-                        if not 'warnings' in signature_msg:
-                            signature_msg['warnings'] = []
-                        signature_msg['warnings'].append('Rule with pcre without content match (possible perfomance issue)')
-                    if app_proto is not None and got_raw_match:
-                        if not 'warnings' in signature_msg:
-                            signature_msg['warnings'] = []
-                        signature_msg['warnings'].append('Application layer "%s" combined with raw match, consider using a match on application buffer' %  (app_proto))
-                    if multiple_app_proto:
-                        if not 'warnings' in signature_msg:
-                            signature_msg['warnings'] = []
-                        signature_msg['warnings'].append('Multiple application layers in same signature')
-                analysis.append(signature_msg)
-        return analysis
+        # JSON decoders take bytes, no need to decode lines first
+        with open(json_path, 'rb') as analysis_file:
+            lines = analysis_file.read().splitlines()
+        analysis = [parse_engine_analysis_line(line) for line in lines]
+        return [signature_msg for signature_msg in analysis if signature_msg is not None]
 
     def build_keywords_list(self):
-        tmpdir = tempfile.mkdtemp()
-        config_file = self.generate_config(tmpdir)
-        suri_cmd = [self.suricata_binary, '--list-keywords=csv', '-l', tmpdir, '-c', config_file]
-        # start suricata in test mode
-        suriprocess = subprocess.Popen(suri_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        (outdata, _) = suriprocess.communicate()
-        shutil.rmtree(tmpdir)
+        with tempfile.TemporaryDirectory(dir=TMPFS_DIR) as tmpdir:
+            config_file = self.generate_config(tmpdir)
+            suri_cmd = [self.suricata_binary, '--list-keywords=csv', '-l', tmpdir, '-c', config_file]
+            # start suricata in test mode
+            suriprocess = subprocess.Popen(suri_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            (outdata, _) = suriprocess.communicate()
         keywords = outdata.decode('utf-8').splitlines()
         keywords.pop(0)
         keywords_list = []
@@ -0,0 +1,142 @@
+import random
+import unittest
+
+from suricatals.parse_signatures import SuricataFile
+
+
+def build_file(lines):
+    file_obj = SuricataFile()
+    file_obj.contents_split = list(lines)
+    file_obj.nLines = len(lines)
+    file_obj.parse_file()
+    return file_obj
+
+
+def replace_line(file_obj, index, text):
+    """Replace a full line the way an editor sends a ranged change"""
+    change = {
+        'range': {
+            'start': {'line': index, 'character': 0},
+            'end': {'line': index, 'character': len(file_obj.contents_split[index])},
+        },
+        'text': text,
+    }
+    reparse, line_range = file_obj.apply_change(change)
+    if reparse:
+        file_obj.parse_file(line_range)
+
+
+def ranged_change(file_obj, start, end, text):
+    change = {
+        'range': {
+            'start': {'line': start[0], 'character': start[1]},
+            'end': {'line': end[0], 'character': end[1]},
+        },
+        'text': text,
+    }
+    reparse, line_range = file_obj.apply_change(change)
+    if reparse:
+        file_obj.parse_file(line_range)
+
+
+def position_offset(lines, position):
+    return sum(len(line) + 1 for line in lines[:position[0]]) + position[1]
+
+
+class TestPartialParse(unittest.TestCase):
+    LINES_POOL = [
+        '',
+        '# comment',
+        'alert a (sid:1;)',
+        'alert b (sid:2;)',
+        'alert c (sid:1;)',
+        'alert d (msg:"no sid";)',
+        'alert e (\\',
+        'sid:2;)',
+    ]
+
+    def assertSameMaps(self, file_obj):
+        full_obj = build_file(file_obj.contents_split)
+        self.assertEqual(file_obj.content_line_map, full_obj.content_line_map)
+        self.assertEqual(file_obj.line_content_map, full_obj.line_content_map)
+        self.assertEqual(file_obj.sid_line_map, full_obj.sid_line_map)
+
+    def test_duplicate_rule_kept(self):
+        file_obj = build_file(['alert a (sid:1;)', '', 'alert a (sid:1;)'])
+        replace_line(file_obj, 2, 'alert b (sid:2;)')
+        self.assertEqual(file_obj.content_line_map['alert a (sid:1;)'], 0)
+        self.assertEqual(file_obj.sid_line_map[1], 0)
+        self.assertSameMaps(file_obj)
+
+    def test_blank_line_kept(self):
+        file_obj = build_file(['', 'alert a (sid:1;)', ''])
+        replace_line(file_obj, 2, 'alert b (sid:2;)')
+        self.assertEqual(file_obj.content_line_map[''], 0)
+        self.assertSameMaps(file_obj)
+
+    def test_random_edits(self):
+        rand = random.Random(42)
+        for _ in range(50):
+            lines = [rand.choice(self.LINES_POOL) for _ in range(rand.randint(1, 12))]
+            file_obj = build_file(lines)
+            for _ in range(30):
+                index = rand.randrange(file_obj.nLines)
+                replace_line(file_obj, index, rand.choice(self.LINES_POOL))
+                self.assertSameMaps(file_obj)
+
+    def test_multi_lines_rule(self):
+        file_obj = build_file(['alert a (\\', 'sid:1;)', 'alert a (sid:1;)', ''])
+        replace_line(file_obj, 2, 'alert b (sid:2;)')
+        self.assertEqual(file_obj.sid_line_map[1], 0)
+        self.assertSameMaps(file_obj)
+
+    def test_append_at_eof(self):
+        file_obj = build_file(['alert a (sid:1;)'])
+        ranged_change(file_obj, (1, 0), (1, 0), 'alert b (sid:2;)\n')
+        self.assertEqual(file_obj.contents_split, ['alert a (sid:1;)', 'alert b (sid:2;)'])
+        self.assertSameMaps(file_obj)
+
+    def test_delete_final_newline(self):
+        file_obj = build_file(['a'])
+        ranged_change(file_obj, (0, 1), (1, 0), '')
+        self.assertEqual(file_obj.contents_split, ['a'])
+        file_obj = build_file(['abc', 'def'])
+        ranged_change(file_obj, (1, 3), (2, 0), '')
+        self.assertEqual(file_obj.contents_split, ['abc', 'def'])
+        self.assertSameMaps(file_obj)
+
+    def test_delete_last_line(self):
+        file_obj = build_file(['alert a (sid:1;)', 'alert b (sid:2;)'])
+        ranged_change(file_obj, (1, 0), (2, 0), '')
+        self.assertEqual(file_obj.contents_split, ['alert a (sid:1;)'])
+        self.assertSameMaps(file_obj)
+
+    def test_multi_lines_change(self):
+        file_obj = build_file(['alert a (sid:1;)', 'alert b (sid:2;)', 'alert c (sid:3;)'])
+        ranged_change(file_obj, (0, 6), (2, 7), 'x (sid:4;)\nalert y')
+        self.assertEqual(file_obj.contents_split, ['alert x (sid:4;)', 'alert y (sid:3;)'])
+        self.assertSameMaps(file_obj)
+
+    def test_random_ranged_edits(self):
+        rand = random.Random(42)
+        texts = ['', '\n', 'alert', ' (sid:1;)', 'sid:2;)\n', '\\\n', '# ', 'a\nb\n']
+        for _ in range(50):
+            lines = [rand.choice(self.LINES_POOL) for _ in range(rand.randint(1, 8))]
+            file_obj = build_file(lines)
+            for _ in range(30):
+                lines = file_obj.contents_split
+                start_line = rand.randrange(len(lines))
+                start = (start_line, rand.randint(0, len(lines[start_line])))
+                end_line = rand.randint(start_line, min(start_line + 2, len(lines) - 1))
+                end_min = start[1] if end_line == start_line else 0
+                end = (end_line, rand.randint(end_min, len(lines[end_line])))
+                new_text = rand.choice(texts)
+                text = "\n".join(lines)
+                text = text[:position_offset(lines, start)] + new_text + text[position_offset(lines, end):]
+                ranged_change(file_obj, start, end, new_text)
+                self.assertEqual(file_obj.contents_split, text.split("\n"))
+                self.assertSameMaps(file_obj)
+
+
+if __name__ == '__main__':
+    unittest.main()
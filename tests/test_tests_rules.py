@@ -0,0 +1,84 @@
+import json
+import os
+import unittest
+
+from suricatals.tests_rules import TestRules
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class TestEngineAnalysisV1(unittest.TestCase):
+    def test_parse_blocks(self):
+        analysis = TestRules().parse_engine_analysis_v1(os.path.join(FIXTURES_DIR, 'analysis_v1'))
+        self.assertEqual(analysis, [
+            {
+                'sid': '1',
+                'content': 'alert tcp any any -> any any (content:"x"; sid:1;)',
+                'warnings': ['TCP rule without a flow option.'],
+                'info': ['Fast Pattern "x" on "payload" buffer.'],
+            },
+            # Block without rule
+            {'sid': '2'},
+            {
+                'sid': '3',
+                'content': 'alert http any any -> any any (msg:"three"; sid:3;)',
+                'warnings': ['one', 'two'],
+            },
+            # Last block is not followed by an empty line and is dropped
+        ])
+
+
+def engine_error(error_code, message):
+    return json.dumps({"engine": {"error_code": error_code, "message": message}})
+
+
+class TestParseSuricataError(unittest.TestCase):
+    def test_raw_lines_single_error(self):
+        output = "\n".join([
+            "Segmentation fault",
+            "",
+            engine_error(39, "bad option foo"),
+            "x" * (TestRules.MAX_LINE_LENGTH + 10),
+            "last line",
+        ]) + "\n"
+        with self.assertLogs('suricatals.tests_rules', level='WARNING'):
+            result = TestRules().parse_suricata_error(output)
+        self.assertEqual(result['warnings'], [])
+        self.assertEqual(len(result['errors']), 2)
+        self.assertEqual(result['errors'][0]['message'], "bad option foo")
+        # Undecoded lines are reported together, long lines are truncated
+        self.assertEqual(result['errors'][1], {
+            'message': "Segmentation fault\n" + "x" * TestRules.MAX_LINE_LENGTH + "...\nlast line\n",
+            'format': 'raw',
+            'source': TestRules.SURICATA_SYNTAX_CHECK,
+        })
+
+    def test_variables_and_files(self):
+        output = "\n".join([
+            engine_error(101, 'variable "FOO_NET" is not defined'),
+            engine_error(101, 'variable "BAR_PORTS" is not defined'),
+            engine_error(101, 'variable "FOO_NET" is not defined'),
+            engine_error(39, 'error parsing signature "alert tcp $FOO_NET any -> any $BAR_PORTS (sid:1;)" '
+                             'from file x at line 1'),
+            engine_error(39, 'error parsing signature "alert tcp any any -> any $BAR_PORTS (sid:2;)" '
+                             'from file x at line 2'),
+            engine_error(41, 'opening hash file /etc/rules/md5.list: No such file or directory'),
+            engine_error(39, 'error parsing signature "alert http any any -> any any (filemd5: md5.list ;sid:3;)" '
+                             'from file x at line 3'),
+            engine_error(39, 'bad option foo'),
+            engine_error(39, 'error parsing signature "alert (foo; sid:9;)" from file x at line 10'),
+        ]) + "\n"
+        result = TestRules().parse_suricata_error(output)
+        self.assertEqual([warning['message'] for warning in result['warnings']], [
+            'Custom address variable "$FOO_NET" is used and need to be defined in probes configuration',
+            'Custom address variable "$BAR_PORTS" is used and need to be defined in probes configuration',
+            'External file "md5.list" is a dependancy and needs to be added to rulesets',
+        ])
+        # Errors on rules using variables or external files are dropped
+        self.assertEqual(result['errors'], [
+            {'error_code': 39, 'message': 'bad option foo', 'source': TestRules.SURICATA_SYNTAX_CHECK, 'line': 9},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()